@@ -1,4 +1,4 @@
 from .__version__ import __version__
 from .task import Task, TaskResult, TaskDependency
 from .html_logging import HTMLSMTPHandler
-from .process import Process, TaskNotFoundError, CircularDependencyError, DependencyNotFoundError
\ No newline at end of file
+from .process import Process, TaskNotFoundError, CircularDependencyError, DependencyNotFoundError, compute_layers
\ No newline at end of file
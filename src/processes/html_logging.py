@@ -1,103 +1,228 @@
-from email.mime.text import MIMEText
-from email.utils import formatdate
+import html
 import logging
 import logging.handlers
-import smtplib
-import traceback
-from typing import Optional
+import time
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    import smtplib
+
+
+# Only the exception, traceback and post traceback body change between emails, so the page is built once.
+_HTML_PREFIX = """<html>
+<head>
+    <style>
+        body {
+            font-family: Arial, sans-serif;
+            margin: 20px;
+            color: #333;
+        }
+        h2 {
+            color: #d9534f;
+        }
+        .exception {
+            font-weight: bold;
+            color: #d9534f;
+        }
+        .traceback {
+            background-color: #f9f2f4;
+            border: 1px solid #d9534f;
+            padding: 10px;
+            font-family: 'Courier New', Courier, monospace;
+            white-space: pre-wrap;
+            color: #333;
+            border-radius: 4px;
+        }
+    </style>
+</head>
+<body>
+    <h2>Exception Details</h2>
+    <p class="exception">Exception: """
+_HTML_TRACEBACK_OPEN = """</p>
+    <p><strong>Traceback:</strong></p>
+    <div class="traceback">"""
+_HTML_TRACEBACK_CLOSE = """</div>
+    <br>
+    """
+_HTML_END = """
+</body>
+</html>
+"""
 
 
 class HTMLSMTPHandler(logging.handlers.SMTPHandler):
     def __init__(self, mailhost: tuple[str, str], fromaddr: str, toaddrs: list[str],
                  credentials: Optional[tuple[str, str]] = None,
                  secure: Optional[tuple | tuple [str] | tuple[str, str]] = None,
-                 timeout: Optional[int] = 5):
+                 timeout: Optional[int] = 5, max_messages_per_connection: Optional[int] = None,
+                 dedup_window: Optional[float] = None, idle_timeout: Optional[float] = None):
         self._crd = credentials
         self._sec = secure
         self._to = timeout
+        self.max_messages_per_connection = max_messages_per_connection
+        self._smtp: Optional["smtplib.SMTP"] = None
+        self._smtp_sent = 0
+        # Seconds after which an unused connection is dropped instead of checked with NOOP, None keeps it.
+        self.idle_timeout = idle_timeout
+        self._smtp_last_used = 0.0
+        # Seconds during which the same error of the same task is not emailed again, None emails every error.
+        self.dedup_window = dedup_window
+        self._last_emailed: dict[tuple[str, str], tuple[float, int]] = {}
 
         super().__init__(mailhost, fromaddr, toaddrs, '', credentials=credentials, secure=secure, timeout=timeout)
+        self.setFormatter(ExceptionHTMLFormatter())
+        self.setLevel(logging.ERROR)
 
     def copy(self):
-        return HTMLSMTPHandler(self.mailhost, self.fromaddr, self.toaddrs, credentials=self._crd, secure=self._sec, timeout=self._to)
+        mailhost = (self.mailhost, self.mailport) if self.mailport else self.mailhost
+        return HTMLSMTPHandler(mailhost, self.fromaddr, self.toaddrs, credentials=self._crd, secure=self._sec, timeout=self._to,
+                              max_messages_per_connection=self.max_messages_per_connection, dedup_window=self.dedup_window,
+                              idle_timeout=self.idle_timeout)
     
     def __copy__(self):
         return self.copy()
 
+    def __reduce__(self):
+        # Locks and connections cannot be pickled, the handler is rebuilt from its configuration instead.
+        mailhost = (self.mailhost, self.mailport) if self.mailport else self.mailhost
+        return (HTMLSMTPHandler, (mailhost, self.fromaddr, self.toaddrs, self._crd, self._sec, self._to, self.max_messages_per_connection,
+                                 self.dedup_window, self.idle_timeout))
+
+    def getSubject(self, record: logging.LogRecord) -> str:
+        # One handler is shared by every Task using it, each record names its task through its logger.
+        # A record can still bring its own subject with extra={"mail_subject": ...}.
+        return getattr(record, "mail_subject", None) or self.subject or f"Error in task {record.name}"
+
+    def _dedup_key(self, record: logging.LogRecord) -> tuple[str, str]:
+        if record.exc_info:
+            error = f"{type(record.exc_info[1]).__name__}: {record.exc_info[1]}"
+        else:
+            error = record.getMessage()
+        return (record.name, error)
+
+    def _suppressed_count(self, key: tuple[str, str]) -> Optional[int]:
+        # None when the error was emailed less than dedup_window seconds ago, counting it as held back,
+        # otherwise how many repeats were held back since it was last emailed.
+        now = time.monotonic()
+        last_emailed = self._last_emailed.get(key)
+        if last_emailed is not None and now - last_emailed[0] < self.dedup_window:
+            self._last_emailed[key] = (last_emailed[0], last_emailed[1] + 1)
+            return None
+        # Errors past the window with no held back repeats have nothing left to report, so they are forgotten.
+        # Those with held back repeats are kept until their next email reports the count.
+        for expired_key in [other_key for other_key, (emailed_at, suppressed) in self._last_emailed.items()
+                            if other_key != key and suppressed == 0 and now - emailed_at >= self.dedup_window]:
+            del self._last_emailed[expired_key]
+        return last_emailed[1] if last_emailed is not None else 0
+
+    def _get_smtp(self) -> "smtplib.SMTP":
+        import smtplib
+
+        # The connection is kept between emails, so a cascade of failed tasks logs in only once.
+        # Callers hold the handler lock (see emit and close), so threads never share a half-open connection.
+        if self._smtp is not None and self.max_messages_per_connection is not None and self._smtp_sent >= self.max_messages_per_connection:
+            self._close_smtp()
+        if self._smtp is not None and self.idle_timeout is not None and time.monotonic() - self._smtp_last_used > self.idle_timeout:
+            # Most servers have dropped a connection idle for that long, so the NOOP round trip is skipped.
+            self._close_smtp()
+        if self._smtp is not None:
+            try:
+                if self._smtp.noop()[0] == 250:
+                    return self._smtp
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._close_smtp()
+
+        port = self.mailport
+        if not port:
+            port = smtplib.SMTP_PORT
+        smtp = smtplib.SMTP(self.mailhost, port, timeout=self.timeout)
+        if self.username:
+            if self.secure is not None:
+                smtp.starttls(*self.secure)
+            smtp.login(self.username, self.password)
+        self._smtp = smtp
+        self._smtp_sent = 0
+        return smtp
+
+    def _close_smtp(self):
+        smtp, self._smtp = self._smtp, None
+        if smtp is None:
+            return
+        import smtplib
+        try:
+            smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            smtp.close()
+
     def emit(self, record):
+        # Like logging.handlers.SMTPHandler, smtplib and email are only imported once an email is sent,
+        # so importing processes stays fast when no task ever fails.
+        from email.mime.text import MIMEText
+        from email.utils import formatdate
+        import smtplib
+
         try:
-            port = self.mailport
-            if not port:
-                port = smtplib.SMTP_PORT
-            smtp = smtplib.SMTP(self.mailhost, port)
+            subject = self.getSubject(record)
+            if self.dedup_window is not None:
+                dedup_key = self._dedup_key(record)
+                suppressed = self._suppressed_count(dedup_key)
+                if suppressed is None:
+                    return
+                if suppressed:
+                    subject = f"{subject} (repeated {suppressed} times since the last email)"
+
             msg = self.format(record)
 
             # Create MIMEText object with HTML content
             mime_msg = MIMEText(msg, 'html')
             mime_msg['From'] = self.fromaddr
             mime_msg['To'] = ','.join(self.toaddrs)
-            mime_msg['Subject'] = self.getSubject(record)
+            mime_msg['Subject'] = subject
             mime_msg['Date'] = formatdate()
 
-            if self.username:
-                if self.secure is not None:
-                    smtp.starttls(*self.secure)
-                smtp.login(self.username, self.password)
-            smtp.sendmail(self.fromaddr, self.toaddrs, mime_msg.as_string())
-            smtp.quit()
+            mime_str = mime_msg.as_string()
+            try:
+                self._get_smtp().sendmail(self.fromaddr, self.toaddrs, mime_str)
+            except smtplib.SMTPServerDisconnected:
+                # The server may close an idle connection between the NOOP check and the send, so it is retried once.
+                self._close_smtp()
+                self._get_smtp().sendmail(self.fromaddr, self.toaddrs, mime_str)
+            self._smtp_sent += 1
+            self._smtp_last_used = time.monotonic()
+            if self.dedup_window is not None:
+                # Only recorded once sent, so repeats of an error whose email failed are still tried.
+                self._last_emailed[dedup_key] = (self._smtp_last_used, 0)
         except Exception:
+            self._close_smtp()
             self.handleError(record)
 
+    def close(self):
+        self.acquire()
+        try:
+            self._close_smtp()
+        finally:
+            self.release()
+        super().close()
+
 
 class ExceptionHTMLFormatter(logging.Formatter):
     def format(self, record: logging.LogRecord):
         # Format the exception details and traceback
         if record.exc_info:
             exception = record.exc_info[1]
-            tb_str = traceback.format_exc()
+            # Taken from the record rather than format_exc, as the email may be formatted in another thread.
+            # Like logging.Formatter, the text is cached in exc_text, so a file handler that already formatted
+            # this record's traceback is not made to walk it again.
+            if not record.exc_text:
+                record.exc_text = self.formatException(record.exc_info)
+            tb_str = record.exc_text
         else:
             exception = record.getMessage()
             tb_str = "No traceback available"
 
         post_traceback_html_body = getattr(record, 'post_traceback_html_body', "")
 
-        # HTML content
-        tb_str = tb_str.replace('\n', '<br>')
-        body = f"""
-        <html>
-        <head>
-            <style>
-                body {{
-                    font-family: Arial, sans-serif;
-                    margin: 20px;
-                    color: #333;
-                }}
-                h2 {{
-                    color: #d9534f;
-                }}
-                .exception {{
-                    font-weight: bold;
-                    color: #d9534f;
-                }}
-                .traceback {{
-                    background-color: #f9f2f4;
-                    border: 1px solid #d9534f;
-                    padding: 10px;
-                    font-family: 'Courier New', Courier, monospace;
-                    white-space: pre-wrap;
-                    color: #333;
-                    border-radius: 4px;
-                }}
-            </style>
-        </head>
-        <body>
-            <h2>Exception Details</h2>
-            <p class="exception">Exception: {exception}</p>
-            <p><strong>Traceback:</strong></p>
-            <div class="traceback">{tb_str}</div>
-            <br>
-            {post_traceback_html_body}
-        </body>
-        </html>
-        """
-        return body
+        # The exception and traceback are plain text, the post traceback body is already HTML.
+        tb_str = html.escape(tb_str).replace('\n', '<br>')
+        return ''.join((_HTML_PREFIX, html.escape(str(exception)), _HTML_TRACEBACK_OPEN, tb_str, _HTML_TRACEBACK_CLOSE, post_traceback_html_body, _HTML_END))
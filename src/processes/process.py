@@ -1,5 +1,14 @@
-from dataclasses import dataclass
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from functools import partial
+import heapq
+import os
+from queue import SimpleQueue
+from typing import Literal, Optional
 
+from . import queue_logging
 from .task import Task, TaskResult
 
 
@@ -21,96 +30,173 @@ class ProcessResult:
     failed_tasks: set[str]
 
 
-@dataclass(slots=True)
+@dataclass(slots=True, frozen=True)
 class Process:
-    tasks: list[Task]
+    tasks: tuple[Task, ...]
+    _tasks_by_name: dict[str, Task] = field(init=False, repr=False)
+    _successors: dict[str, list[str]] = field(init=False, repr=False)
+    _heights: dict[str, int] = field(init=False, repr=False)
 
     def __post_init__(self):
-        self._check_input_types()
-        self._check_dependencies()
-        self._sort_tasks()        
+        # Type checks are stripped under python -O.
+        if __debug__:
+            self._check_input_types()
+        self._sort_tasks()
+
+    def __enter__(self) -> "Process":
+        # Inside the with block, log records are written by a background thread instead of the tasks' threads.
+        queue_logging.start()
+        for task in self.tasks:
+            task._ensure_logger()
+            queue_logging.defer_handlers(task.logger)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        queue_logging.stop()
+        for task in self.tasks:
+            queue_logging.restore_handlers(task.logger)
+            # Written by the listener after the task's own flush.
+            task._flush_logs()
 
     def _check_input_types(self):
-        if not isinstance(self.tasks, list):
-            raise TypeError(f"tasks must be list. Got {type(self.tasks)}")
+        if not isinstance(self.tasks, (list, tuple)):
+            raise TypeError(f"tasks must be list or tuple. Got {type(self.tasks)}")
         
         for task in self.tasks:
             if not isinstance(task, Task):
                 raise TypeError(f"task must be of type Task. Got {type(task)}")   
-                
-    def _check_dependencies(self):
-        tasks_names = []
-        # Check duplicate tasks
+
+    def _sort_tasks(self):
+        # Duplicate names, missing dependencies and circular dependencies are all detected
+        # while building the graph and running Kahn's algorithm over it.
+        tasks_by_name: dict[str, Task] = {}
         for task in self.tasks:
-            if task.name in tasks_names:
+            if task.name in tasks_by_name:
                 raise ValueError(f"Duplicate task name: {task.name}")
-            tasks_names.append(task.name)
-
-        # Check non present dependencies
-        for task_name in tasks_names:
-            task = self.get_task(task_name)
-            task_dependencies_names = task.get_dependencies_names()
-            for dependency in task_dependencies_names:
-                if dependency not in tasks_names:
-                    raise DependencyNotFoundError(f"Dependency not found: {dependency}. Task: {task.name}. Dependencies: {task_dependencies_names}")
-            
-        def check_circular_dependencies():
-            stack = []
-
-            def dfs(task: Task):
-                if task.name in stack:
-                    stack.append(task.name)
-                    circular_dependency_repr = " -> ".join(stack)
-                    raise CircularDependencyError(f"Found circular dependency: {circular_dependency_repr}")
-                
-                stack.append(task.name)
-
-                task_names_dependencies = task.get_dependencies_names()
-                for dependency_name in task_names_dependencies:
-                    dependency_task = self.get_task(dependency_name)
-                    if dependency_task.dependencies:
-                        dfs(dependency_task)
-                    
-                stack.remove(task.name)
+            tasks_by_name[task.name] = task
+            task._cache_dependencies_names()
 
-            for task in self.tasks:
-                dfs(task)
+        in_degree: dict[str, int] = {}
+        successors: dict[str, list[str]] = {task_name: [] for task_name in tasks_by_name}
+        has_dependencies = False
+        for task in self.tasks:
+            task_dependencies_names = task._dependencies_names
+            for dependency_name in task_dependencies_names:
+                if dependency_name not in tasks_by_name:
+                    raise DependencyNotFoundError(f"Dependency not found: {dependency_name}. Task: {task.name}. Dependencies: {task.get_dependencies_names()}")
+                successors[dependency_name].append(task.name)
+            in_degree[task.name] = len(task_dependencies_names)
+            has_dependencies = has_dependencies or bool(task_dependencies_names)
 
-        check_circular_dependencies()
+        if not has_dependencies:
+            # Independent tasks (including empty and single task Processes) are already in a valid order.
+            object.__setattr__(self, "_tasks_by_name", tasks_by_name)
+            object.__setattr__(self, "_successors", successors)
+            object.__setattr__(self, "tasks", tuple(self.tasks))
+            object.__setattr__(self, "_heights", dict.fromkeys(tasks_by_name, 1))
+            return
 
-    def _sort_tasks(self):
+        queue = deque(task_name for task_name, degree in in_degree.items() if degree == 0)
         sorted_tasks = []
-        tasks_to_sort = [t.name for t in self.tasks]
-        while tasks_to_sort:
-            for task_name in tasks_to_sort[:]:
-                task = self.get_task(task_name)
-                if all(dependency.task_name in sorted_tasks for dependency in task.dependencies):
-                    sorted_tasks.append(task_name)
-                    tasks_to_sort.remove(task_name)
+        while queue:
+            task_name = queue.popleft()
+            sorted_tasks.append(tasks_by_name[task_name])
+            for successor_name in successors[task_name]:
+                in_degree[successor_name] -= 1
+                if in_degree[successor_name] == 0:
+                    queue.append(successor_name)
+
+        # The Process is frozen, so the attributes derived from its tasks are set through object.__setattr__.
+        object.__setattr__(self, "_tasks_by_name", tasks_by_name)
+        object.__setattr__(self, "_successors", successors)
+        if len(sorted_tasks) != len(self.tasks):
+            unsorted_tasks_names = [task_name for task_name, degree in in_degree.items() if degree > 0]
+            circular_dependency_repr = " -> ".join(self._find_circular_dependency(unsorted_tasks_names))
+            raise CircularDependencyError(f"Found circular dependency: {circular_dependency_repr}")
+
+        # Stored as a tuple, so the sorted order cannot be changed from outside.
+        object.__setattr__(self, "tasks", tuple(sorted_tasks))
 
-        self.tasks = [self.get_task(task_name) for task_name in sorted_tasks]
+        # Length of the longest chain of tasks starting at each task, used to prioritize parallel submissions.
+        heights: dict[str, int] = {}
+        for task in reversed(sorted_tasks):
+            heights[task.name] = 1 + max((heights[successor_name] for successor_name in successors[task.name]), default=0)
+        object.__setattr__(self, "_heights", heights)
+
+    def _find_circular_dependency(self, tasks_names: list[str]) -> list[str]:
+        # Only called once Kahn's algorithm left tasks unsorted, to describe one of the cycles.
+        # Iterative three-state DFS: 0 = not visited, 1 = on the current path, 2 = fully explored.
+        state = dict.fromkeys(tasks_names, 0)
+        for root_name in tasks_names:
+            if state[root_name]:
+                continue
+            state[root_name] = 1
+            path = [root_name]
+            stack = [iter(self._tasks_by_name[root_name].dependencies)]
+            while stack:
+                for dependency in stack[-1]:
+                    dependency_state = state.get(dependency.task_name)
+                    if dependency_state == 1:
+                        return path + [dependency.task_name]
+                    if dependency_state == 0:
+                        state[dependency.task_name] = 1
+                        path.append(dependency.task_name)
+                        stack.append(iter(self._tasks_by_name[dependency.task_name].dependencies))
+                        break
+                else:
+                    state[path.pop()] = 2
+                    stack.pop()
+        return []
 
     def get_task(self, task_name: str) -> Task:
-        for task in self.tasks:
-            if task.name == task_name:
-                return task
-        raise TaskNotFoundError(f"Task not found: {task_name}")
+        try:
+            return self._tasks_by_name[task_name]
+        except KeyError:
+            raise TaskNotFoundError(f"Task not found: {task_name}") from None
     
     def get_dependant_tasks(self, task_name: str) -> list[Task]:
+        # Breadth-first walk over the successor lists built while sorting.
         dependant_tasks = []
-
-        def dfs(current_task_name) -> list[str]:
-            for task in self.tasks:
-                if task in dependant_tasks:
-                    continue
-                if current_task_name in task.get_dependencies_names():
-                    dependant_tasks.append(task)
-                    dfs(task.name)
-
-        dfs(task_name)
+        visited = {task_name}
+        queue = deque([task_name])
+        while queue:
+            for successor_name in self._successors.get(queue.popleft(), ()):
+                if successor_name not in visited:
+                    visited.add(successor_name)
+                    dependant_tasks.append(self._tasks_by_name[successor_name])
+                    queue.append(successor_name)
         return dependant_tasks
     
-    def run(self) -> ProcessResult:
+    def _get_dependant_tasks_html_body(self, task_name: str) -> Optional[str]:
+        dependant_tasks = self.get_dependant_tasks(task_name)
+        if not dependant_tasks:
+            return None
+        items = "".join(f"<li>{dependant_task.name}</li>" for dependant_task in dependant_tasks)
+        return f"<p>This failure led that the following dependant tasks will not run:</p><ul>{items}</ul>"
+
+    def _get_dependencies_results(self, task: Task, passed_results: dict[str, TaskResult]) -> tuple[tuple, dict]:
+        extra_args = tuple(passed_results[task_name].result for task_name in task._args_dependencies_names)
+        extra_kwargs = {kwarg_name: passed_results[task_name].result for task_name, kwarg_name in task._kwargs_dependencies_names}
+        return extra_args, extra_kwargs
+
+    def _run_task(self, task: Task, passed_results: dict[str, TaskResult], executor: Optional[Executor] = None) -> TaskResult:
+        extra_args, extra_kwargs = self._get_dependencies_results(task, passed_results)
+        return task.run(post_traceback_html_body_factory=partial(self._get_dependant_tasks_html_body, task.name), aditional_args=extra_args, aditional_kwargs=extra_kwargs,
+                        executor=executor)
+
+    def _release_dependencies_results(self, task: Task, passed_results: dict[str, TaskResult], remaining_consumers: dict[str, int]):
+        # Called once a task is done with its dependencies results, dropping those no other task is waiting for.
+        for dependency in task.dependencies:
+            remaining_consumers[dependency.task_name] -= 1
+            if remaining_consumers[dependency.task_name] == 0:
+                passed_results.pop(dependency.task_name, None)
+
+    def clear_cache(self):
+        for task in self.tasks:
+            task.clear_cache()
+
+    def run(self, parallel: bool = False, max_workers: Optional[int] = None, executor_kind: Literal["thread", "process", "auto"] = "thread",
+            keep_results: bool = True) -> ProcessResult:
         """
         Executes the tasks in the correct order, respecting their dependencies.
 
@@ -118,45 +204,163 @@ class Process:
         all tasks depending on it will not be executed. The results of successful tasks are stored 
         and passed as arguments to subsequent tasks if specified.
 
+        Tasks created with cacheable=True are not run again by later calls when their arguments, including
+        the dependencies results they receive, are unchanged; the previous TaskResult is reused instead.
+
+        Args:
+            parallel (bool): If True, tasks run in a thread pool and each task becomes ready as soon as
+                all of its dependencies have passed, so independent tasks run concurrently. When more tasks are ready
+                than there are threads, those starting the longest chains of dependant tasks run first.
+            max_workers (Optional[int]): Maximum number of threads (and worker processes) used when parallel is True.
+                Defaults to the executors' defaults.
+            executor_kind (Literal["thread", "process", "auto"]): Where task functions are called when parallel is True.
+                "thread" calls them in the thread pool. "process" calls every function in a ProcessPoolExecutor, so functions,
+                arguments and results must be picklable. "auto" only sends tasks with cpu_bound=True to the ProcessPoolExecutor.
+                Logging always happens in the calling process.
+            keep_results (bool): If False, the result of a task is released as soon as every task depending on it is done,
+                so large intermediate results do not live until the end of the run. passed_tasks_results then only holds the
+                results of tasks that no other task depends on.
+
         Returns:
             ProcessResult: An object containing the results of the tasks that passed and a set of task names that failed.
 
         Raises:
+            ValueError: If executor_kind is not one of "thread", "process" or "auto".
             TaskNotFoundError: If a task required by a dependency is not found in the list of tasks.
             DependencyNotFoundError: If a dependency for a task is not found in the list of tasks.
             CircularDependencyError: If a circular dependency is detected among the tasks.
         """
+        if executor_kind not in ("thread", "process", "auto"):
+            raise ValueError(f"executor_kind must be 'thread', 'process' or 'auto'. Got {executor_kind}")
+        remaining_consumers = None if keep_results else {task_name: len(successors) for task_name, successors in self._successors.items()}
+        if parallel:
+            return self._run_parallel(max_workers, executor_kind, remaining_consumers)
+
         failed_tasks: set[str] = set()
         passed_results: dict[str, TaskResult] = {}
         for task in self.tasks:
-            skip_task = False
-            for dependency in task.dependencies:
-                if dependency.task_name in failed_tasks:
+            # A failure marks its whole dependant subtree at once, so doomed tasks are skipped before their
+            # dependencies results are gathered.
+            if task.name not in failed_tasks:
+                task_result: TaskResult = self._run_task(task, passed_results)
+                if not task_result.worked:
                     failed_tasks.add(task.name)
-                    skip_task = True
-                    break
-            if skip_task:
-                continue
-            dependant_tasks = self.get_dependant_tasks(task.name)
-            if dependant_tasks:
-                post_traceback_html_body = "<p>This failure led that the following dependant tasks will not run:</p><ul>"
-                for dependant_task in dependant_tasks:
-                    post_traceback_html_body += f"<li>{dependant_task.name}</li>"
-                post_traceback_html_body += "</ul>"
-            else:
-                post_traceback_html_body = None
-            extra_args = tuple(passed_results[d.task_name].result for d in task.dependencies if d.use_result_as_additional_args)
-            extra_kwargs = {d.additional_kwarg_name: passed_results[d.task_name].result for d in task.dependencies if d.use_result_as_additional_kwargs}
-            task_result: TaskResult = task.run(post_traceback_html_body=post_traceback_html_body, aditional_args=extra_args, aditional_kwargs=extra_kwargs)
-            if not task_result.worked:
-                failed_tasks.add(task.name)
-            else:
+                    failed_tasks.update(dependant_task.name for dependant_task in self.get_dependant_tasks(task.name))
+                else:
+                    passed_results[task.name] = task_result
+            if remaining_consumers is not None:
+                self._release_dependencies_results(task, passed_results, remaining_consumers)
+
+        return ProcessResult(passed_results, failed_tasks)
+
+    def _run_parallel(self, max_workers: Optional[int], executor_kind: Literal["thread", "process", "auto"],
+                      remaining_consumers: Optional[dict[str, int]]) -> ProcessResult:
+        failed_tasks: set[str] = set()
+        passed_results: dict[str, TaskResult] = {}
+        remaining_dependencies = {task.name: len(task._dependencies_names) for task in self.tasks}
+        use_process_pool = executor_kind == "process" or (executor_kind == "auto" and any(task.cpu_bound for task in self.tasks))
+        # Same default as ThreadPoolExecutor. At most this many tasks are submitted at once, so the ready tasks
+        # heading the longest chains are picked first instead of waiting in the executor's queue.
+        max_threads = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        ready: list[tuple[int, int, Task]] = []
+        order = {task.name: index for index, task in enumerate(self.tasks)}
+        with ThreadPoolExecutor(max_workers=max_threads) as executor, \
+                (ProcessPoolExecutor(max_workers=max_workers) if use_process_pool else nullcontext()) as process_pool:
+            running: dict[Future, Task] = {}
+            # Futures put themselves here when done, so each completion is handled without waiting on every running future.
+            done_futures: SimpleQueue[Future] = SimpleQueue()
+
+            def push(task: Task):
+                heapq.heappush(ready, (-self._heights[task.name], order[task.name], task))
+
+            def complete(task: Task, task_result: TaskResult):
+                if remaining_consumers is not None:
+                    self._release_dependencies_results(task, passed_results, remaining_consumers)
+                if not task_result.worked:
+                    failed_tasks.add(task.name)
+                    for dependant_task in self.get_dependant_tasks(task.name):
+                        if dependant_task.name in failed_tasks:
+                            continue
+                        failed_tasks.add(dependant_task.name)
+                        # Skipped tasks are done with their dependencies too, as in the sequential run.
+                        if remaining_consumers is not None:
+                            self._release_dependencies_results(dependant_task, passed_results, remaining_consumers)
+                    return
                 passed_results[task.name] = task_result
+                for successor_name in self._successors[task.name]:
+                    remaining_dependencies[successor_name] -= 1
+                    if remaining_dependencies[successor_name] == 0 and successor_name not in failed_tasks:
+                        push(self._tasks_by_name[successor_name])
+
+            def submit_ready():
+                while ready and len(running) < max_threads:
+                    task = heapq.heappop(ready)[2]
+                    # Only looked up once the task has cached results, so a first run computes its key only once, in run.
+                    cached_result = task._get_cached_result(*self._get_dependencies_results(task, passed_results)) if task.cacheable and task._result_cache else None
+                    if cached_result is not None:
+                        # Cached results are taken here, without a round trip through the thread pool.
+                        complete(task, cached_result)
+                        continue
+                    task_process_pool = process_pool if executor_kind == "process" or task.cpu_bound else None
+                    future = executor.submit(self._run_task, task, passed_results, task_process_pool)
+                    running[future] = task
+                    future.add_done_callback(done_futures.put)
+
+            for task in self.tasks:
+                if remaining_dependencies[task.name] == 0:
+                    push(task)
+            submit_ready()
+
+            while running:
+                future = done_futures.get()
+                complete(running.pop(future), future.result())
+                submit_ready()
 
         return ProcessResult(passed_results, failed_tasks)
 
     def close_loggers(self):
+        # Tasks may share handlers, each one is closed only once.
+        closed_handlers: set[int] = set()
         for task in self.tasks:
-            for handler in task.logger.handlers[:]:
-                handler.close()
-            task.logger.removeHandler(handler)
+            handlers = task.logger.handlers
+            for handler in handlers:
+                if id(handler) not in closed_handlers:
+                    closed_handlers.add(id(handler))
+                    handler.close()
+            handlers.clear()
+            # Handlers are attached again if the task runs after this.
+            task._logger_ready = False
+
+
+def compute_layers(tasks: list[Task]) -> list[list[Task]]:
+    """
+    Groups tasks in layers, where every task only depends on tasks from previous layers.
+
+    Tasks in the same layer do not depend on each other and can run concurrently. Layers are the waves of
+    Kahn's algorithm: the first one holds the tasks without dependencies.
+
+    Args:
+        tasks (list[Task]): Tasks to group, in any order.
+
+    Returns:
+        list[list[Task]]: The layers, in the order they can run.
+
+    Raises:
+        DependencyNotFoundError: If a dependency for a task is not found in the list of tasks.
+        CircularDependencyError: If a circular dependency is detected among the tasks.
+    """
+    # Building a Process validates the tasks and their dependencies graph.
+    process = Process(tasks)
+    in_degree = {task.name: len(task._dependencies_names) for task in process.tasks}
+    layers = []
+    layer = [task for task in process.tasks if in_degree[task.name] == 0]
+    while layer:
+        layers.append(layer)
+        next_layer = []
+        for task in layer:
+            for successor_name in process._successors[task.name]:
+                in_degree[successor_name] -= 1
+                if in_degree[successor_name] == 0:
+                    next_layer.append(process._tasks_by_name[successor_name])
+        layer = next_layer
+    return layers
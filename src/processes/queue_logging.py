@@ -0,0 +1,107 @@
+import atexit
+import copy
+import logging
+import logging.handlers
+import queue
+import threading
+from typing import Optional
+
+
+_queue: queue.SimpleQueue = queue.SimpleQueue()
+_listener: Optional[logging.handlers.QueueListener] = None
+_listener_users = 0
+_listener_lock = threading.Lock()
+_background_started = False
+_background_lock = threading.Lock()
+
+
+class DeferredHandler(logging.handlers.QueueHandler):
+    """Puts records in the module queue; the background listener hands them to ``targets``."""
+    def __init__(self, targets: tuple[logging.Handler, ...], restorable: bool = True):
+        super().__init__(_queue)
+        self.targets = targets
+        # Handlers from defer_handler stay deferred, restore_handlers only unwraps those from defer_handlers.
+        self.restorable = restorable
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Records never leave the interpreter, so unlike QueueHandler.prepare the exc_info is kept
+        # for formatters such as ExceptionHTMLFormatter.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        record.deferred_targets = self.targets
+        return record
+
+    def close(self):
+        for target in self.targets:
+            target.close()
+        super().close()
+
+
+class _TargetsHandler(logging.Handler):
+    def handle(self, record: logging.LogRecord) -> bool:
+        for target in record.deferred_targets:
+            if record.levelno >= target.level:
+                target.handle(record)
+        drained = getattr(record, "drained", None)
+        if drained is not None:
+            drained.set()
+        return True
+
+
+def start():
+    global _listener, _listener_users
+    with _listener_lock:
+        _listener_users += 1
+        if _listener is None:
+            _listener = logging.handlers.QueueListener(_queue, _TargetsHandler())
+            _listener.start()
+
+
+def stop():
+    """Waits until every queued record has been handled, stopping the listener once its last user is done."""
+    global _listener, _listener_users
+    with _listener_lock:
+        _listener_users -= 1
+        if _listener_users == 0:
+            _listener.stop()
+            _listener = None
+            return
+    drained = threading.Event()
+    _queue.put(logging.makeLogRecord({"deferred_targets": (), "drained": drained}))
+    drained.wait()
+
+
+def _start_background():
+    # A listener user held until interpreter exit, for handlers that are always deferred.
+    global _background_started
+    with _background_lock:
+        if _background_started:
+            return
+        start()
+        # Registered after logging's own shutdown hook, so queued records are handled before handlers are closed.
+        atexit.register(stop)
+        _background_started = True
+
+
+def defer_handler(handler: logging.Handler) -> DeferredHandler:
+    """Wraps a slow handler, such as a mail handler, so it is always called from the background listener."""
+    _start_background()
+    return DeferredHandler((handler,), restorable=False)
+
+
+def defer_handlers(logger: logging.Logger):
+    handlers = tuple(handler for handler in logger.handlers if not isinstance(handler, DeferredHandler))
+    if not handlers:
+        return
+    for handler in handlers:
+        logger.removeHandler(handler)
+    logger.addHandler(DeferredHandler(handlers))
+
+
+def restore_handlers(logger: logging.Logger):
+    for handler in logger.handlers[:]:
+        if isinstance(handler, DeferredHandler) and handler.restorable:
+            logger.removeHandler(handler)
+            for target in handler.targets:
+                logger.addHandler(target)
@@ -1,12 +1,74 @@
-from dataclasses import dataclass, field
+from concurrent.futures import Executor
+from dataclasses import dataclass, field, fields
+import hashlib
 import logging
-from typing import Any, Callable, Optional
+import os
+import pickle
+import threading
+import time
+from typing import Any, Callable, NamedTuple, Optional
 
-from .html_logging import HTMLSMTPHandler, ExceptionHTMLFormatter
+from . import queue_logging
+from .html_logging import HTMLSMTPHandler
 
 
-@dataclass(slots=True)
-class TaskResult:
+_TASK_FORMATTER = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+_RESULT_CACHE_SIZE = 128
+# Seconds between the background flushes of the task file handlers, the longest a record stays buffered.
+_FLUSH_INTERVAL = 1.0
+# Passed as extra by records that must reach the file right away, such as the start of a task.
+_FLUSH_NOW = {"task_flush": True}
+_FILE_HANDLERS: dict[str, logging.FileHandler] = {}
+_FILE_HANDLERS_LOCK = threading.Lock()
+_flush_thread: Optional[threading.Thread] = None
+
+
+class _TaskFileHandler(logging.FileHandler):
+    # Records below ERROR stay in the stream buffer until Task.run is done or the next background flush.
+    def emit(self, record: logging.LogRecord):
+        if self.stream is None:
+            if self.mode != 'w' or not self._closed:
+                self.stream = self._open()
+        if self.stream:
+            try:
+                self.stream.write(self.format(record) + self.terminator)
+                if record.levelno >= logging.ERROR or getattr(record, "task_flush", False):
+                    self.flush()
+            except RecursionError:
+                raise
+            except Exception:
+                self.handleError(record)
+
+
+def _flush_file_handlers():
+    while True:
+        time.sleep(_FLUSH_INTERVAL)
+        with _FILE_HANDLERS_LOCK:
+            file_handlers = tuple(_FILE_HANDLERS.values())
+        for file_handler in file_handlers:
+            file_handler.flush()
+
+
+def _get_file_handler(log_path: str) -> logging.FileHandler:
+    global _flush_thread
+    # Tasks writing to the same file share one handler, so the file is opened once, on the first record written to it.
+    # Keyed by the real path, so relative paths and links to one file still end up with a single handler.
+    real_path = os.path.realpath(log_path)
+    with _FILE_HANDLERS_LOCK:
+        file_handler = _FILE_HANDLERS.get(real_path)
+        if file_handler is None:
+            file_handler = _TaskFileHandler(real_path, delay=True)
+            file_handler.setLevel(logging.INFO)
+            file_handler.setFormatter(_TASK_FORMATTER)
+            _FILE_HANDLERS[real_path] = file_handler
+            if _flush_thread is None:
+                # Bounds how long records logged outside Task.run, or by a long running func, wait in the buffer.
+                _flush_thread = threading.Thread(target=_flush_file_handlers, name="processes-log-flush", daemon=True)
+                _flush_thread.start()
+        return file_handler
+
+
+class TaskResult(NamedTuple):
     worked: bool
     result: Any
     exception: Optional[Exception]
@@ -20,6 +82,25 @@ class TaskDependency:
     additional_kwarg_name: Optional[str] = field(default=None, repr=False)
 
     def __post_init__(self):
+        # Type checks are stripped under python -O.
+        if __debug__:
+            self._check_input_types()
+        # A configuration check rather than a type check, so it also runs under python -O.
+        if self.use_result_as_additional_kwargs and not isinstance(self.additional_kwarg_name, str):
+            raise TypeError(f"If use_result_as_additional_kwargs is True, additional_kwarg_name must be set of type str. Got {type(self.additional_kwarg_name)}")
+
+    @classmethod
+    def unchecked(cls, task_name: str, use_result_as_additional_args: bool = False, use_result_as_additional_kwargs: bool = False,
+                  additional_kwarg_name: Optional[str] = None) -> "TaskDependency":
+        """Builds a TaskDependency without type checks, for callers that already validated their input."""
+        dependency = object.__new__(cls)
+        dependency.task_name = task_name
+        dependency.use_result_as_additional_args = use_result_as_additional_args
+        dependency.use_result_as_additional_kwargs = use_result_as_additional_kwargs
+        dependency.additional_kwarg_name = additional_kwarg_name
+        return dependency
+
+    def _check_input_types(self):
         if not isinstance(self.task_name, str):
             raise TypeError(f"task_name must be of type str. Got {type(self.task_name)}")
         if not isinstance(self.use_result_as_additional_args, bool):
@@ -27,10 +108,6 @@ class TaskDependency:
         if not isinstance(self.use_result_as_additional_kwargs, bool):
             raise TypeError(f"use_result_as_additional_kwargs must be of type bool. Got {type(self.use_result_as_additional_kwargs)}")
 
-        if self.use_result_as_additional_kwargs and not isinstance(self.additional_kwarg_name, str):
-            raise TypeError(f"If use_result_as_additional_kwargs is True, additional_kwarg_name must be set of type str. Got {type(self.additional_kwarg_name)}")
-        
-        
     def __hash__(self) -> int:
         return hash(self.task_name)
 
@@ -40,46 +117,88 @@ class Task:
     name: str
     log_path: str
     func: Callable
-    args: tuple = field(default_factory=tuple)
+    args: tuple = ()
     kwargs: dict = field(default_factory=dict)
 
     dependencies: list[TaskDependency] = field(default_factory=list)
     
     html_mail_handler: HTMLSMTPHandler = field(default=None, repr=False)
-    logger: logging.Logger = field(init=False, repr=False)
+    cpu_bound: bool = field(default=False, repr=False)
+    cacheable: bool = field(default=False, repr=False)
+    cache_key_fn: Optional[Callable[..., Any]] = field(default=None, repr=False)
+    _logger: Optional[logging.Logger] = field(default=None, init=False, repr=False)
+    _logger_ready: bool = field(default=False, init=False, repr=False)
+    _dependencies_names: frozenset[str] = field(init=False, repr=False)
+    _args_dependencies_names: tuple[str, ...] = field(init=False, repr=False)
+    _kwargs_dependencies_names: tuple[tuple[str, str], ...] = field(init=False, repr=False)
+    _result_cache: dict[bytes, TaskResult] = field(default_factory=dict, init=False, repr=False)
+    _result_cache_func: Optional[Callable[..., Any]] = field(default=None, init=False, repr=False)
 
     def __post_init__(self):
-        self._check_input_types()
+        # Type checks are stripped under python -O.
+        if __debug__:
+            self._check_input_types()
         if ' ' in self.name:
             raise ValueError(f"Task name cannot contain spaces. Got {self.name}")
 
-        depedencies_names = []
+        self._cache_dependencies_names()
+
+    def _cache_dependencies_names(self):
+        # Computed when the Task is built and again by each Process built with it, so a dependencies list
+        # changed in between is still picked up.
+        depedencies_names: set[str] = set()
         for dependency in self.dependencies:
             if dependency.task_name in depedencies_names:
                 raise ValueError(f"Duplicate dependency name: {dependency.task_name}")
-            depedencies_names.append(dependency.task_name)
+            depedencies_names.add(dependency.task_name)
             if dependency.task_name == self.name:
                 raise ValueError(f"Got dependency with same name as Task. Task: {self.name}. Dependency: {dependency.task_name}")
+        self._dependencies_names = frozenset(depedencies_names)
+        # Which dependencies results are passed to func, and as which kwarg.
+        self._args_dependencies_names = tuple(dependency.task_name for dependency in self.dependencies if dependency.use_result_as_additional_args)
+        self._kwargs_dependencies_names = tuple((dependency.task_name, dependency.additional_kwarg_name) for dependency in self.dependencies
+                                                if dependency.use_result_as_additional_kwargs)
+
+    def __getstate__(self) -> dict[str, Any]:
+        # Loggers and their handlers belong to one interpreter, an unpickled Task sets up its own on first run.
+        state = {task_field.name: getattr(self, task_field.name) for task_field in fields(self)}
+        state["_logger"] = None
+        state["_logger_ready"] = False
+        return state
+
+    def __setstate__(self, state: dict[str, Any]):
+        for name, value in state.items():
+            setattr(self, name, value)
 
-        logger = logging.getLogger(self.name)
+    @property
+    def logger(self) -> logging.Logger:
+        # Looked up on first use; handlers are attached on first run, see _ensure_logger.
+        if self._logger is None:
+            logger = logging.getLogger(self.name)
+            if logger.handlers:
+                # Left over by a previous Task with the same name.
+                logger.handlers.clear()
+            self._logger = logger
+        return self._logger
+
+    def _ensure_logger(self):
+        if self._logger_ready:
+            return
+
+        logger = self.logger
         logger.setLevel(logging.DEBUG)
-        if logger.hasHandlers():
-            logger.handlers.clear()
         
-        file_handler = logging.FileHandler(self.log_path)
-        file_handler.setLevel(logging.INFO)
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+        logger.addHandler(_get_file_handler(self.log_path))
         
         if self.html_mail_handler is not None:
-            _html_mail_handler = self.html_mail_handler.copy()
-            _html_mail_handler.setFormatter(ExceptionHTMLFormatter())
-            _html_mail_handler.setLevel(logging.ERROR)
-            _html_mail_handler.subject = f"Error in task {self.name}"        
-            logger.addHandler(_html_mail_handler)
+            # Sending an email takes a while, so it happens in the background instead of in the task's thread.
+            logger.addHandler(queue_logging.defer_handler(self.html_mail_handler))
 
-        self.logger = logger
+        self._logger_ready = True
+
+    def _flush_logs(self):
+        for handler in self.logger.handlers:
+            handler.flush()
 
     def _check_input_types(self):
         if not callable(self.func):
@@ -94,6 +213,15 @@ class Task:
         if self.html_mail_handler is not None and not isinstance(self.html_mail_handler, HTMLSMTPHandler):
             raise TypeError(f"mail_cfg must be of type SMTPHandler (easy_smtp library). Got {type(self.html_mail_handler)}")
         
+        if not isinstance(self.cpu_bound, bool):
+            raise TypeError(f"cpu_bound must be bool. Got {type(self.cpu_bound)}")
+
+        if not isinstance(self.cacheable, bool):
+            raise TypeError(f"cacheable must be bool. Got {type(self.cacheable)}")
+
+        if self.cache_key_fn is not None and not callable(self.cache_key_fn):
+            raise TypeError(f"cache_key_fn must be callable. Got {type(self.cache_key_fn)}")
+
         if not isinstance(self.dependencies, list):
             raise TypeError(f"dependencies must be list. Got {type(self.dependencies)}")
         
@@ -101,8 +229,48 @@ class Task:
             if not isinstance(dependency, TaskDependency):
                 raise TypeError(f"dependency must be of type TaskDependency. Got {type(dependency)}")            
 
+    def _get_call_arguments(self, aditional_args: Optional[tuple[Any]], aditional_kwargs: Optional[dict[str, Any]]) -> tuple[tuple, dict]:
+        # Additional arguments only apply to this call, so running the task again does not accumulate them.
+        # self.args and self.kwargs are used as they are when there is nothing to merge.
+        call_args = self.args + tuple(aditional_args) if aditional_args else self.args
+        call_kwargs = {**self.kwargs, **aditional_kwargs} if aditional_kwargs else self.kwargs
+        return call_args, call_kwargs
+
+    def _get_cache_key(self, call_args: tuple, call_kwargs: dict) -> Optional[bytes]:
+        if self._result_cache_func is not self.func:
+            # Results of a previous func do not apply to the one now assigned.
+            self._result_cache.clear()
+            self._result_cache_func = self.func
+        if self.cache_key_fn is not None:
+            inputs = self.cache_key_fn(*call_args, **call_kwargs)
+        else:
+            inputs = (call_args, sorted(call_kwargs.items()))
+        try:
+            pickled = pickle.dumps(inputs)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            # Inputs that cannot be pickled cannot be compared between runs, so the task just runs.
+            return None
+        return hashlib.blake2b(pickled).digest()
+
+    def _get_cached_result(self, extra_args: tuple, extra_kwargs: dict) -> Optional[TaskResult]:
+        # Lets Process take a cached result without calling run, which would compute the key again.
+        try:
+            cache_key = self._get_cache_key(*self._get_call_arguments(extra_args, extra_kwargs))
+        except Exception:
+            # Left to run, which reports the cache_key_fn error as the task's failure.
+            return None
+        task_result = self._result_cache.get(cache_key) if cache_key is not None else None
+        if task_result is not None:
+            self._ensure_logger()
+            self.logger.info("Reused cached result of %s.", self.name)
+            self._flush_logs()
+        return task_result
+
+    def clear_cache(self):
+        self._result_cache.clear()
+
     def get_dependencies_names(self) -> set[str]:
-        return {dependency.task_name for dependency in self.dependencies}
+        return set(self._dependencies_names)
     
     def add_args(self, *args):
         self.args += args
@@ -110,19 +278,39 @@ class Task:
     def add_kwargs(self, **kwargs):
         self.kwargs = {**self.kwargs, **kwargs}
 
-    def run(self, aditional_args: Optional[tuple[Any]] = None, aditional_kwargs: Optional[dict[str, Any]] = None, post_traceback_html_body: Optional[str] = None) -> TaskResult:
+    def run(self, aditional_args: Optional[tuple[Any]] = None, aditional_kwargs: Optional[dict[str, Any]] = None, post_traceback_html_body: Optional[str] = None,
+            post_traceback_html_body_factory: Optional[Callable[[], Optional[str]]] = None, executor: Optional[Executor] = None) -> TaskResult:
+        self._ensure_logger()
+        # Looked up once per run rather than through the property for every record.
+        logger = self.logger
+        call_args, call_kwargs = self._get_call_arguments(aditional_args, aditional_kwargs)
         try:
-            if aditional_args:
-                self.add_args(*aditional_args)
-            if aditional_kwargs:
-                self.add_kwargs(**aditional_kwargs)
-            self.logger.info(f"Starting {self.name}.")
-            result = self.func(*self.args, **self.kwargs)
-            self.logger.info(f"Finished {self.name}.")
-            return TaskResult(True, result, None)
+            # Inside the try, so a failing cache_key_fn fails the task like func would.
+            cache_key = self._get_cache_key(call_args, call_kwargs) if self.cacheable else None
+            if cache_key is not None and cache_key in self._result_cache:
+                logger.info("Reused cached result of %s.", self.name)
+                return self._result_cache[cache_key]
+            # Written right away, so a long running or hung task already shows in its log file.
+            logger.info("Starting %s.", self.name, extra=_FLUSH_NOW)
+            if executor is not None:
+                # Only the function call is handed to the executor; logging stays in this process.
+                result = executor.submit(self.func, *call_args, **call_kwargs).result()
+            else:
+                result = self.func(*call_args, **call_kwargs)
+            logger.info("Finished %s.", self.name)
+            task_result = TaskResult(True, result, None)
+            if cache_key is not None:
+                if len(self._result_cache) >= _RESULT_CACHE_SIZE:
+                    # Oldest entry first, dicts keep insertion order.
+                    del self._result_cache[next(iter(self._result_cache))]
+                self._result_cache[cache_key] = task_result
+            return task_result
         except Exception as e:
-            if post_traceback_html_body is None:
-                post_traceback_html_body = ""
-            post_traceback_html_body += f"<br><p>Function was: {self.func.__name__}. Args were: {self.args}. Kwargs were: {self.kwargs}.</p>"
-            self.logger.exception(e, extra={"post_traceback_html_body": post_traceback_html_body})
+            # The factory lets callers defer building the body until a failure actually happens.
+            if post_traceback_html_body is None and post_traceback_html_body_factory is not None:
+                post_traceback_html_body = post_traceback_html_body_factory()
+            report = f"{post_traceback_html_body or ''}<br><p>Function was: {self.func.__name__}. Args were: {call_args}. Kwargs were: {call_kwargs}.</p>"
+            logger.exception(e, extra={"post_traceback_html_body": report})
             return TaskResult(False, None, e)
+        finally:
+            self._flush_logs()
@@ -1,6 +1,7 @@
 import os
 
 curdir = os.path.dirname(__file__)
-for file in os.listdir(curdir):
-    if file.endswith(".log"):
-        os.remove(os.path.join(curdir, file))
\ No newline at end of file
+with os.scandir(curdir) as entries:
+    for entry in entries:
+        if entry.name.endswith(".log"):
+            os.remove(entry.path)
@@ -4,18 +4,10 @@ from processes import Process, Task
 
 import pytest
 
-def clean_tasks_logs(tasks: list[Task]):
-    curdir = os.path.dirname(__file__)
-    print(curdir)
-    for task in tasks:
-            task_logger = task.logger
-            for handler in task_logger.handlers[:]:
-                handler.close()
-                task_logger.removeHandler(handler)
-    for file in os.listdir(curdir):
-        print(os.path.join(curdir, file))
-        if file.endswith(".log"):
-            os.remove(os.path.join(curdir, file))
+from .log_cleaner import clean_tasks_logs
+
+_CURDIR = os.path.dirname(__file__)
+
 
 def test_unique_name():
     def task_1() -> int:
@@ -25,7 +17,7 @@ def test_unique_name():
     def task_3(t2_res: int) -> int:
         return 3 + t2_res
     
-    curdir = os.path.dirname(__file__)
+    curdir = _CURDIR
     tasks: list[Task] = []
     try:
         t1 = Task("task_1", os.path.join(curdir, "logfile_12.log"), task_1)
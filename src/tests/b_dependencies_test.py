@@ -1,19 +1,12 @@
 import os
 
-from processes import Process, Task, TaskDependency, DependencyNotFoundError, CircularDependencyError
+from processes import Process, Task, TaskDependency, DependencyNotFoundError, CircularDependencyError, compute_layers
 
 import pytest
 
-def clean_tasks_logs(tasks: list[Task]):
-    curdir = os.path.dirname(__file__)
-    for task in tasks:
-            task_logger = task.logger
-            for handler in task_logger.handlers[:]:
-                handler.close()
-                task_logger.removeHandler(handler)
-    for file in os.listdir(curdir):
-        if file.endswith(".log"):
-            os.remove(os.path.join(curdir, file))
+from .log_cleaner import clean_tasks_logs
+
+_CURDIR = os.path.dirname(__file__)
 
 
 def test_present_dependencies():
@@ -24,7 +17,7 @@ def test_present_dependencies():
     def task_3(t2_res: int) -> int:
         return 3 + t2_res
     
-    curdir = os.path.dirname(__file__)
+    curdir = _CURDIR
     tasks: list[Task] = []
     try:
         t1 = Task("task_1", os.path.join(curdir, "logfile_12.log"), task_1)
@@ -54,7 +47,7 @@ def test_duplicate_dependency():
     def task_3(t2_res: int) -> int:
         return 3 + t2_res
     
-    curdir = os.path.dirname(__file__)
+    curdir = _CURDIR
     did_not_fail = False
     with pytest.raises(ValueError, match="Duplicate dependency name: task_1"):
         t3 = Task("task_3", os.path.join(curdir, "logfile_3.log"), task_3, args=(1,), dependencies=[TaskDependency("task_1"), TaskDependency("task_1")])
@@ -68,7 +61,7 @@ def test_self_dependency():
     def task_3(t2_res: int) -> int:
         return 3 + t2_res
     
-    curdir = os.path.dirname(__file__)
+    curdir = _CURDIR
     did_not_fail = False
     with pytest.raises(ValueError, match=f"Got dependency with same name as Task. Task: task_3. Dependency: task_3"):
         t3 = Task("task_3", os.path.join(curdir, "logfile_3.log"), task_3, args=(1,), dependencies=[TaskDependency("task_1"), TaskDependency("task_3")])
@@ -83,7 +76,7 @@ def test_circular_dependency_one_level():
         return 1
     def task_2() -> int:
         return 2
-    curdir = os.path.dirname(__file__)
+    curdir = _CURDIR
 
     try:
         tasks = []
@@ -110,7 +103,7 @@ def test_circular_dependency_two_levels():
     def task_3(t2_res: int) -> int:
         return 3 + t2_res
 
-    curdir = os.path.dirname(__file__)
+    curdir = _CURDIR
 
     try:
         tasks = []
@@ -142,7 +135,7 @@ def test_circular_dependency_two_levels2():
     def task_4(t3_res: int) -> int:
         return 4 + t3_res
 
-    curdir = os.path.dirname(__file__)
+    curdir = _CURDIR
 
     try:
         tasks = []
@@ -161,4 +154,72 @@ def test_circular_dependency_two_levels2():
     with pytest.raises(CircularDependencyError, match="Found circular dependency: task_1 -> task_3 -> task_4 -> task_1"):
         process = Process(tasks)
 
-    clean_tasks_logs(tasks)
\ No newline at end of file
+    clean_tasks_logs(tasks)
+
+
+def test_compute_layers():
+    def task_1() -> int:
+        return 1
+
+    curdir = _CURDIR
+    tasks: list[Task] = []
+    t4 = Task("task_4", os.path.join(curdir, "logfile_12.log"), task_1, dependencies=[TaskDependency("task_2"), TaskDependency("task_3")])
+    tasks.append(t4)
+    t1 = Task("task_1", os.path.join(curdir, "logfile_12.log"), task_1)
+    tasks.append(t1)
+    t2 = Task("task_2", os.path.join(curdir, "logfile_12.log"), task_1, dependencies=[TaskDependency("task_1")])
+    tasks.append(t2)
+    t3 = Task("task_3", os.path.join(curdir, "logfile_12.log"), task_1)
+    tasks.append(t3)
+
+    layers = compute_layers(tasks)
+    assert [[task.name for task in layer] for layer in layers] == [["task_1", "task_3"], ["task_2"], ["task_4"]]
+
+    clean_tasks_logs(tasks)
+
+
+def test_unchecked_dependency():
+    def task_1() -> int:
+        return 1
+    def task_2(t1_res: int) -> int:
+        return 2 + t1_res
+
+    curdir = _CURDIR
+    tasks: list[Task] = []
+    t1 = Task("task_1", os.path.join(curdir, "logfile_12.log"), task_1)
+    tasks.append(t1)
+    t2 = Task("task_2", os.path.join(curdir, "logfile_12.log"), task_2, dependencies=[TaskDependency.unchecked("task_1", use_result_as_additional_args=True)])
+    tasks.append(t2)
+
+    assert t2.dependencies[0] == TaskDependency("task_1", use_result_as_additional_args=True)
+    process_result = Process(tasks).run()
+    assert process_result.passed_tasks_results["task_2"].result == 3
+
+    clean_tasks_logs(tasks)
+
+
+def test_dependency_added_after_task_built():
+    def task_1() -> int:
+        return 1
+    def task_2() -> int:
+        return 2
+    def task_3(t1_res: int, t2_res: int) -> int:
+        return 3 + t1_res + t2_res
+
+    curdir = _CURDIR
+    tasks: list[Task] = []
+    t1 = Task("task_1", os.path.join(curdir, "logfile_12.log"), task_1)
+    tasks.append(t1)
+    t2 = Task("task_2", os.path.join(curdir, "logfile_12.log"), task_2)
+    tasks.append(t2)
+    t3 = Task("task_3", os.path.join(curdir, "logfile_3.log"), task_3, dependencies=[TaskDependency("task_1", use_result_as_additional_args=True)])
+    tasks.append(t3)
+    t3.dependencies.append(TaskDependency("task_2", use_result_as_additional_args=True))
+
+    process = Process(tasks)
+    for parallel in [False, True]:
+        process_result = process.run(parallel=parallel)
+        assert len(process_result.failed_tasks) == 0
+        assert process_result.passed_tasks_results["task_3"].result == 6
+
+    clean_tasks_logs(tasks)
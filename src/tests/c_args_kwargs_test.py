@@ -2,12 +2,16 @@ import os
 
 from processes import Process, Task, TaskDependency
 
+from .log_cleaner import bulk_unlink, clean_tasks_logs
+
+_CURDIR = os.path.dirname(__file__)
+
 
 def test_args():
     def div10(a: int) -> int:
         return 10 / a
     
-    curdir = os.path.dirname(__file__)
+    curdir = _CURDIR
     t1 = Task("task_1", os.path.join(curdir, "logfile_12.log"), div10, args=(2,))
     task_result = t1.run()
 
@@ -22,10 +26,7 @@ def test_args():
     assert task_result.result is None
     assert isinstance(task_result.exception, ZeroDivisionError)
     
-    for task in [t1, t2]:
-        for handler in task.logger.handlers[:]:
-            handler.close()
-            task.logger.removeHandler(handler)
+    clean_tasks_logs([t1, t2], remove_logs=False)
     os.remove(os.path.join(curdir, "logfile_12.log"))
 
 
@@ -33,7 +34,7 @@ def test_args_kwargs():
     def div(a: int, b: int=2) -> int:
         return a / b
     
-    curdir = os.path.dirname(__file__)
+    curdir = _CURDIR
     t1 = Task("task_1", os.path.join(curdir, "logfile_123.log"), div, args=(10,))
     task_result = t1.run()
 
@@ -55,10 +56,7 @@ def test_args_kwargs():
     assert task_result.result is None
     assert isinstance(task_result.exception, ZeroDivisionError)
     
-    for task in [t1, t2, t3]:
-        for handler in task.logger.handlers[:]:
-            handler.close()
-            task.logger.removeHandler(handler)
+    clean_tasks_logs([t1, t2, t3], remove_logs=False)
     os.remove(os.path.join(curdir, "logfile_123.log"))
 
 
@@ -69,7 +67,7 @@ def test_add_extra_args():
     def div(a: int, b: int) -> int:
         return a / b
     
-    curdir = os.path.dirname(__file__)
+    curdir = _CURDIR
     tasks = []
     t1 = Task("task_1", os.path.join(curdir, "logfile_12.log"), t1)
     tasks.append(t1)
@@ -83,10 +81,33 @@ def test_add_extra_args():
     assert process_result.passed_tasks_results["task_1"].result == 2
     assert process_result.passed_tasks_results["task_2"].result == 5
     
-    for task in [t1, t2]:
-        for handler in task.logger.handlers[:]:
-            handler.close()
-            task.logger.removeHandler(handler)
+    clean_tasks_logs([t1, t2], remove_logs=False)
+    os.remove(os.path.join(curdir, "logfile_12.log"))
+
+
+def test_rerun_process_extra_args():
+    def t1():
+        return 2
+    
+    def div(a: int, b: int) -> int:
+        return a / b
+    
+    curdir = _CURDIR
+    tasks = []
+    t1 = Task("task_1", os.path.join(curdir, "logfile_12.log"), t1)
+    tasks.append(t1)
+    t2 = Task("task_2", os.path.join(curdir, "logfile_12.log"), div, args=(10, ), dependencies=[TaskDependency("task_1", use_result_as_additional_args=True)])
+    tasks.append(t2)
+    process = Process(tasks)
+    first_process_result = process.run()
+    second_process_result = process.run()
+
+    assert len(second_process_result.failed_tasks) == 0
+    assert first_process_result.passed_tasks_results["task_2"].result == 5
+    assert second_process_result.passed_tasks_results["task_2"].result == 5
+    assert t2.args == (10, )
+    
+    clean_tasks_logs([t1, t2], remove_logs=False)
     os.remove(os.path.join(curdir, "logfile_12.log"))
 
 
@@ -103,7 +124,7 @@ def test_add_extra_args_kwargs():
     def div(a: int, b: int, c: int=5) -> int:
         return (a + b) / c
     
-    curdir = os.path.dirname(__file__)
+    curdir = _CURDIR
     tasks = []
     t0 = Task("task_0", os.path.join(curdir, "logfile_0.log"),
                 random_routine_to_do_first)
@@ -127,10 +148,56 @@ def test_add_extra_args_kwargs():
     assert process_result.passed_tasks_results["task_2"].result == 5
     assert process_result.passed_tasks_results["task_3"].result == 4
 
-    for task in [t0, t1, t2, t3]:
-        for handler in task.logger.handlers[:]:
-            handler.close()
-            task.logger.removeHandler(handler)
-    os.remove(os.path.join(curdir, "logfile_0.log"))
+    clean_tasks_logs([t0, t1, t2, t3], remove_logs=False)
+    bulk_unlink([os.path.join(curdir, "logfile_0.log"), os.path.join(curdir, "logfile_12.log"), os.path.join(curdir, "logfile_3.log")])
+
+def test_release_consumed_results():
+    def get_b() -> int:
+        return 10
+
+    def get_c() -> int:
+        return 5
+
+    def div(a: int, b: int, c: int=5) -> float:
+        return (a + b) / c
+
+    curdir = _CURDIR
+    tasks = []
+    t1 = Task("task_1", os.path.join(curdir, "logfile_12.log"), get_b)
+    tasks.append(t1)
+    t2 = Task("task_2", os.path.join(curdir, "logfile_12.log"), get_c)
+    tasks.append(t2)
+    t3 = Task("task_3", os.path.join(curdir, "logfile_3.log"),
+                div, args=(10, ), dependencies=[TaskDependency("task_1", use_result_as_additional_args=True),
+                                                TaskDependency("task_2", use_result_as_additional_kwargs=True, additional_kwarg_name="c")])
+    tasks.append(t3)
+    process = Process(tasks)
+
+    for parallel in [False, True]:
+        process_result = process.run(parallel=parallel, keep_results=False)
+
+        assert len(process_result.failed_tasks) == 0
+        assert list(process_result.passed_tasks_results) == ["task_3"]
+        assert process_result.passed_tasks_results["task_3"].result == 4
+
+    clean_tasks_logs(tasks, remove_logs=False)
+    bulk_unlink([os.path.join(curdir, "logfile_12.log"), os.path.join(curdir, "logfile_3.log")])
+
+
+def test_assign_args_kwargs():
+    def div(a: int, b: int = 1) -> float:
+        return a / b
+
+    curdir = _CURDIR
+    t1 = Task("task_1", os.path.join(curdir, "logfile_12.log"), div, args=(1,))
+    assert t1.run().result == 1
+
+    t1.args = (4,)
+    t1.kwargs["b"] = 2
+    assert t1.run().result == 2
+
+    t1.func = lambda a, b: a * b
+    assert t1.run().result == 8
+
+    clean_tasks_logs([t1], remove_logs=False)
     os.remove(os.path.join(curdir, "logfile_12.log"))
-    os.remove(os.path.join(curdir, "logfile_3.log"))
\ No newline at end of file
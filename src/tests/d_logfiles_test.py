@@ -1,13 +1,19 @@
 import os
+import time
 
 from processes import Process, Task
+from processes.task import _FLUSH_INTERVAL
+
+from .log_cleaner import bulk_unlink, clean_tasks_logs
+
+_CURDIR = os.path.dirname(__file__)
 
 
 def test_single_task_worked_log_entry():
     def task_1() -> int:
         return 1
     
-    curdir = os.path.dirname(__file__)
+    curdir = _CURDIR
     tasks = []
     log_file_path = os.path.join(curdir, "logfile_1.log")
     t1 = Task("task_1", log_file_path, task_1)
@@ -22,9 +28,7 @@ def test_single_task_worked_log_entry():
         assert "Starting task_1." in lines[0]
         assert "Finished task_1." in lines[1]
 
-    for handler in t1.logger.handlers[:]:
-        handler.close()
-        t1.logger.removeHandler(handler)
+    clean_tasks_logs([t1], remove_logs=False)
     os.remove(log_file_path)
 
 
@@ -32,7 +36,7 @@ def test_two_task_worked_log_entry_same_logfile():
     def task_1() -> int:
         return 1
     
-    curdir = os.path.dirname(__file__)
+    curdir = _CURDIR
     tasks = []
     log_file_path = os.path.join(curdir, "logfile_1.log")
     t1 = Task("task_1", log_file_path, task_1)
@@ -51,10 +55,7 @@ def test_two_task_worked_log_entry_same_logfile():
         assert "Starting task_2." in lines[2]
         assert "Finished task_2." in lines[3]
 
-    for task in tasks:
-        for handler in task.logger.handlers[:]:
-            handler.close()
-            t1.logger.removeHandler(handler)
+    clean_tasks_logs(tasks, remove_logs=False)
     os.remove(log_file_path)
 
 
@@ -65,7 +66,7 @@ def test_two_task_worked_log_entry_different_logfile():
     def task_2() -> int:
         return 2
     
-    curdir = os.path.dirname(__file__)
+    curdir = _CURDIR
     tasks = []
     log_file_path1 = os.path.join(curdir, "logfile_1.log")
     log_file_path2 = os.path.join(curdir, "logfile_2.log")
@@ -89,19 +90,15 @@ def test_two_task_worked_log_entry_different_logfile():
         assert "Starting task_2." in lines[0]
         assert "Finished task_2." in lines[1]
 
-    for task in tasks:
-        for handler in task.logger.handlers[:]:
-            handler.close()
-            t1.logger.removeHandler(handler)
-    os.remove(log_file_path1)
-    os.remove(log_file_path2)
+    clean_tasks_logs(tasks, remove_logs=False)
+    bulk_unlink([log_file_path1, log_file_path2])
 
 
 def test_exception_log_entry():
     def task_1() -> int:
         return 1 / 0
     
-    curdir = os.path.dirname(__file__)
+    curdir = _CURDIR
     tasks = []
     log_file_path = os.path.join(curdir, "logfile_1.log")
     t1 = Task("task_1", log_file_path, task_1)
@@ -117,7 +114,107 @@ def test_exception_log_entry():
         assert "division by zero" in lines[1]
         assert "division by zero" in lines[-1]
 
-    for handler in t1.logger.handlers[:]:
-        handler.close()
-        t1.logger.removeHandler(handler)
-    os.remove(log_file_path)
\ No newline at end of file
+    clean_tasks_logs([t1], remove_logs=False)
+    os.remove(log_file_path)
+
+
+def test_context_manager_log_entries():
+    def task_1() -> int:
+        return 1
+    
+    curdir = _CURDIR
+    tasks = []
+    log_file_path = os.path.join(curdir, "logfile_1.log")
+    t1 = Task("task_1", log_file_path, task_1)
+    tasks.append(t1)
+    t2 = Task("task_2", log_file_path, task_1)
+    tasks.append(t2)
+    
+    with Process(tasks) as process:
+        process.run(parallel=True)
+
+    with open(log_file_path, "r") as f:
+        lines = f.readlines()
+        assert len(lines) == 4
+        for task in tasks:
+            assert sum(f"Starting {task.name}." in line for line in lines) == 1
+            assert sum(f"Finished {task.name}." in line for line in lines) == 1
+
+    clean_tasks_logs(tasks, remove_logs=False)
+    os.remove(log_file_path)
+
+
+def test_close_loggers_shared_logfile():
+    def task_1() -> int:
+        return 1
+
+    curdir = _CURDIR
+    log_file_path = os.path.join(curdir, "logfile_1.log")
+    t1 = Task("task_1", log_file_path, task_1)
+    t2 = Task("task_2", log_file_path, task_1)
+    process = Process([t1, t2])
+    process.run()
+    process.close_loggers()
+
+    assert t1.logger.handlers == []
+    assert t2.logger.handlers == []
+
+    process.run()
+    with open(log_file_path, "r") as f:
+        assert sum(1 for _ in f) == 8
+
+    process.close_loggers()
+    os.remove(log_file_path)
+
+
+def test_shared_logfile_relative_path():
+    def task_1() -> int:
+        return 1
+
+    curdir = _CURDIR
+    log_file_path = os.path.join(curdir, "logfile_1.log")
+    t1 = Task("task_1", log_file_path, task_1)
+    t2 = Task("task_2", os.path.relpath(log_file_path), task_1)
+    process = Process([t1, t2])
+    process.run()
+
+    assert t1.logger.handlers == t2.logger.handlers
+    with open(log_file_path, "r") as f:
+        assert sum(1 for _ in f) == 4
+
+    process.close_loggers()
+    os.remove(log_file_path)
+
+
+def test_start_log_entry_written_while_running():
+    curdir = _CURDIR
+    log_file_path = os.path.join(curdir, "logfile_1.log")
+    lines_while_running = []
+
+    def read_log():
+        with open(log_file_path, "r") as f:
+            lines_while_running.extend(f.readlines())
+
+    t1 = Task("task_1", log_file_path, read_log)
+    Process([t1]).run()
+
+    assert len(lines_while_running) == 1
+    assert "Starting task_1." in lines_while_running[0]
+
+    clean_tasks_logs([t1], remove_logs=False)
+    os.remove(log_file_path)
+
+
+def test_log_entry_flushed_outside_run():
+    curdir = _CURDIR
+    log_file_path = os.path.join(curdir, "logfile_1.log")
+    t1 = Task("task_1", log_file_path, lambda: 1)
+    t1.run()
+    t1.logger.info("Logged outside run.")
+
+    time.sleep(2 * _FLUSH_INTERVAL)
+    with open(log_file_path, "r") as f:
+        assert "Logged outside run." in f.readlines()[-1]
+
+    clean_tasks_logs([t1], remove_logs=False)
+    os.remove(log_file_path)
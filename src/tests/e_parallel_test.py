@@ -0,0 +1,219 @@
+import os
+import pickle
+import threading
+
+from processes import Process, Task, TaskDependency
+
+from .log_cleaner import clean_tasks_logs
+
+_CURDIR = os.path.dirname(__file__)
+
+
+# Functions sent to worker processes must be importable, so they live at module level.
+def square(value: int) -> int:
+    return value * value
+
+
+def inverse(value: int) -> float:
+    return 1 / value
+
+
+def test_parallel_independent_tasks():
+    # Every task waits until all three are running, so the tasks only pass if they overlap.
+    barrier = threading.Barrier(3, timeout=5)
+
+    def wait_and_return(value: int) -> int:
+        barrier.wait()
+        return value
+
+    curdir = _CURDIR
+    log_file_path = os.path.join(curdir, "logfile_parallel.log")
+    tasks = [Task(f"task_{i}", log_file_path, wait_and_return, args=(i,)) for i in range(3)]
+    process = Process(tasks)
+
+    process_result = process.run(parallel=True, max_workers=3)
+
+    assert len(process_result.failed_tasks) == 0
+    assert {name: task_result.result for name, task_result in process_result.passed_tasks_results.items()} == {"task_0": 0, "task_1": 1, "task_2": 2}
+
+    clean_tasks_logs(tasks, remove_logs=False)
+    os.remove(log_file_path)
+
+
+def test_parallel_dependencies_results():
+    def get_b() -> int:
+        return 10
+
+    def get_c() -> int:
+        return 5
+
+    def div(a: int, b: int, c: int=5) -> float:
+        return (a + b) / c
+
+    curdir = _CURDIR
+    log_file_path = os.path.join(curdir, "logfile_parallel.log")
+    tasks = []
+    t1 = Task("task_1", log_file_path, get_b)
+    tasks.append(t1)
+    t2 = Task("task_2", log_file_path, get_c)
+    tasks.append(t2)
+    t3 = Task("task_3", log_file_path, div, args=(10, ), dependencies=[TaskDependency("task_1", use_result_as_additional_args=True),
+                                                                      TaskDependency("task_2", use_result_as_additional_kwargs=True, additional_kwarg_name="c")])
+    tasks.append(t3)
+    process = Process(tasks)
+    process_result = process.run(parallel=True)
+
+    assert len(process_result.failed_tasks) == 0
+    assert process_result.passed_tasks_results["task_3"].result == 4
+
+    clean_tasks_logs(tasks, remove_logs=False)
+    os.remove(log_file_path)
+
+
+def test_parallel_failed_dependency():
+    def fail() -> int:
+        return 1 / 0
+
+    def task_ok() -> int:
+        return 1
+
+    def add_one(a: int) -> int:
+        return a + 1
+
+    curdir = _CURDIR
+    log_file_path = os.path.join(curdir, "logfile_parallel.log")
+    tasks = []
+    t1 = Task("task_1", log_file_path, fail)
+    tasks.append(t1)
+    t2 = Task("task_2", log_file_path, add_one, dependencies=[TaskDependency("task_1", use_result_as_additional_args=True)])
+    tasks.append(t2)
+    t3 = Task("task_3", log_file_path, add_one, dependencies=[TaskDependency("task_2", use_result_as_additional_args=True)])
+    tasks.append(t3)
+    t4 = Task("task_4", log_file_path, task_ok)
+    tasks.append(t4)
+    process = Process(tasks)
+    process_result = process.run(parallel=True, max_workers=2)
+
+    assert process_result.failed_tasks == {"task_1", "task_2", "task_3"}
+    assert list(process_result.passed_tasks_results) == ["task_4"]
+
+    clean_tasks_logs(tasks, remove_logs=False)
+    os.remove(log_file_path)
+
+
+def test_process_executor():
+    curdir = _CURDIR
+    log_file_path = os.path.join(curdir, "logfile_parallel.log")
+    tasks = []
+    t1 = Task("task_1", log_file_path, square, args=(3,))
+    tasks.append(t1)
+    t2 = Task("task_2", log_file_path, square, dependencies=[TaskDependency("task_1", use_result_as_additional_args=True)])
+    tasks.append(t2)
+    t3 = Task("task_3", log_file_path, inverse, args=(0,))
+    tasks.append(t3)
+    process = Process(tasks)
+    process_result = process.run(parallel=True, max_workers=2, executor_kind="process")
+
+    assert process_result.failed_tasks == {"task_3"}
+    assert process_result.passed_tasks_results["task_2"].result == 81
+
+    with open(log_file_path, "r") as f:
+        log = f.read()
+        assert "Finished task_2." in log
+        assert "division by zero" in log
+
+    clean_tasks_logs(tasks, remove_logs=False)
+    os.remove(log_file_path)
+
+
+def test_auto_executor_cpu_bound_tasks():
+    curdir = _CURDIR
+    log_file_path = os.path.join(curdir, "logfile_parallel.log")
+    tasks = []
+    t1 = Task("task_1", log_file_path, square, args=(4,), cpu_bound=True)
+    tasks.append(t1)
+    t2 = Task("task_2", log_file_path, lambda: 2)
+    tasks.append(t2)
+    process = Process(tasks)
+    process_result = process.run(parallel=True, executor_kind="auto")
+
+    assert len(process_result.failed_tasks) == 0
+    assert process_result.passed_tasks_results["task_1"].result == 16
+    assert process_result.passed_tasks_results["task_2"].result == 2
+
+    clean_tasks_logs(tasks, remove_logs=False)
+    os.remove(log_file_path)
+
+
+def test_parallel_longest_chain_first():
+    started = []
+
+    def record(name: str):
+        started.append(name)
+
+    curdir = _CURDIR
+    log_file_path = os.path.join(curdir, "logfile_parallel.log")
+    tasks = []
+    t1 = Task("task_1", log_file_path, record, args=("task_1",))
+    tasks.append(t1)
+    t2 = Task("task_2", log_file_path, record, args=("task_2",))
+    tasks.append(t2)
+    t3 = Task("task_3", log_file_path, record, args=("task_3",), dependencies=[TaskDependency("task_2")])
+    tasks.append(t3)
+    process = Process(tasks)
+    process_result = process.run(parallel=True, max_workers=1)
+
+    assert len(process_result.failed_tasks) == 0
+    assert started[0] == "task_2"
+
+    clean_tasks_logs(tasks, remove_logs=False)
+    os.remove(log_file_path)
+
+
+def test_pickle_task():
+    curdir = _CURDIR
+    log_file_path = os.path.join(curdir, "logfile_parallel.log")
+    t1 = Task("task_1", log_file_path, square, args=(3,))
+    assert t1.run().result == 9
+    clean_tasks_logs([t1], remove_logs=False)
+
+    t1_copy = pickle.loads(pickle.dumps(t1))
+    assert t1_copy.run().result == 9
+
+    with open(log_file_path, "r") as f:
+        assert len(f.readlines()) == 4
+
+    clean_tasks_logs([t1_copy], remove_logs=False)
+    os.remove(log_file_path)
+
+
+def test_parallel_release_results_failed_branch():
+    def fail() -> int:
+        return 1 / 0
+
+    def task_ok() -> int:
+        return 1
+
+    def add(a: int, b: int) -> int:
+        return a + b
+
+    curdir = _CURDIR
+    log_file_path = os.path.join(curdir, "logfile_parallel.log")
+    tasks = []
+    t1 = Task("task_1", log_file_path, task_ok)
+    tasks.append(t1)
+    t2 = Task("task_2", log_file_path, fail)
+    tasks.append(t2)
+    t3 = Task("task_3", log_file_path, add, dependencies=[TaskDependency("task_1", use_result_as_additional_args=True),
+                                                          TaskDependency("task_2", use_result_as_additional_args=True)])
+    tasks.append(t3)
+    process = Process(tasks)
+
+    for parallel in [False, True]:
+        process_result = process.run(parallel=parallel, keep_results=False)
+
+        assert process_result.failed_tasks == {"task_2", "task_3"}
+        assert process_result.passed_tasks_results == {}
+
+    clean_tasks_logs(tasks, remove_logs=False)
+    os.remove(log_file_path)
@@ -0,0 +1,153 @@
+import os
+
+from processes import Process, Task, TaskDependency
+
+from .log_cleaner import clean_tasks_logs
+
+_CURDIR = os.path.dirname(__file__)
+
+
+def test_cacheable_tasks_run_once():
+    calls = []
+
+    def get_a() -> int:
+        calls.append("task_1")
+        return 2
+
+    def double(a: int) -> int:
+        calls.append("task_2")
+        return a * 2
+
+    curdir = _CURDIR
+    log_file_path = os.path.join(curdir, "logfile_cache.log")
+    tasks = []
+    t1 = Task("task_1", log_file_path, get_a, cacheable=True)
+    tasks.append(t1)
+    t2 = Task("task_2", log_file_path, double, dependencies=[TaskDependency("task_1", use_result_as_additional_args=True)], cacheable=True)
+    tasks.append(t2)
+    t3 = Task("task_3", log_file_path, lambda: calls.append("task_3"))
+    tasks.append(t3)
+    process = Process(tasks)
+
+    process.run()
+    process_result = process.run(parallel=True)
+
+    assert sorted(calls) == ["task_1", "task_2", "task_3", "task_3"]
+    assert process_result.passed_tasks_results["task_2"].result == 4
+
+    process.clear_cache()
+    process.run()
+    assert calls.count("task_1") == 2
+
+    clean_tasks_logs(tasks, remove_logs=False)
+    os.remove(log_file_path)
+
+
+def test_cache_key_fn():
+    calls = []
+
+    def add(a: int, b: int) -> int:
+        calls.append((a, b))
+        return a + b
+
+    curdir = _CURDIR
+    log_file_path = os.path.join(curdir, "logfile_cache.log")
+    t1 = Task("task_1", log_file_path, add, args=(1,), kwargs={"b": 2}, cacheable=True, cache_key_fn=lambda a, b: a)
+    process = Process([t1])
+
+    process.run()
+    t1.add_kwargs(b=3)
+    process.run()
+    assert calls == [(1, 2)]
+
+    clean_tasks_logs([t1], remove_logs=False)
+    os.remove(log_file_path)
+
+
+def test_cacheable_task_run():
+    calls = []
+
+    def add(a: int, b: int) -> int:
+        calls.append((a, b))
+        return a + b
+
+    curdir = _CURDIR
+    log_file_path = os.path.join(curdir, "logfile_cache.log")
+    t1 = Task("task_1", log_file_path, add, args=(1,), cacheable=True)
+
+    assert t1.run(aditional_args=(2,)).result == 3
+    assert t1.run(aditional_args=(2,)).result == 3
+    assert t1.run(aditional_args=(3,)).result == 4
+    assert calls == [(1, 2), (1, 3)]
+
+    clean_tasks_logs([t1], remove_logs=False)
+    os.remove(log_file_path)
+
+
+def test_failing_cache_key_fn():
+    def bad_key(a: int) -> int:
+        raise KeyError("no key")
+
+    curdir = _CURDIR
+    log_file_path = os.path.join(curdir, "logfile_cache.log")
+    tasks = []
+    t1 = Task("task_1", log_file_path, lambda: 1)
+    tasks.append(t1)
+    t2 = Task("task_2", log_file_path, lambda a: a, cacheable=True, cache_key_fn=bad_key,
+              dependencies=[TaskDependency("task_1", use_result_as_additional_args=True)])
+    tasks.append(t2)
+    process = Process(tasks)
+
+    for parallel in [False, True]:
+        process_result = process.run(parallel=parallel)
+        assert process_result.failed_tasks == {"task_2"}
+    assert isinstance(t2.run(aditional_args=(1,)).exception, KeyError)
+
+    with open(log_file_path, "r") as f:
+        assert "no key" in f.read()
+
+    clean_tasks_logs(tasks, remove_logs=False)
+    os.remove(log_file_path)
+
+
+def test_assign_func_cacheable():
+    curdir = _CURDIR
+    log_file_path = os.path.join(curdir, "logfile_cache.log")
+    t1 = Task("task_1", log_file_path, lambda a: a + 1, args=(1,), cacheable=True)
+    assert t1.run().result == 2
+
+    t1.func = lambda a: a * 10
+    assert t1.run().result == 10
+
+    clean_tasks_logs([t1], remove_logs=False)
+    os.remove(log_file_path)
+
+
+def test_cache_key_fn_calls():
+    key_calls = []
+
+    def get_key(a: int) -> int:
+        key_calls.append(a)
+        return a
+
+    curdir = _CURDIR
+    log_file_path = os.path.join(curdir, "logfile_cache.log")
+    tasks = []
+    t1 = Task("task_1", log_file_path, lambda: 1)
+    tasks.append(t1)
+    t2 = Task("task_2", log_file_path, lambda a: a, cacheable=True, cache_key_fn=get_key,
+              dependencies=[TaskDependency("task_1", use_result_as_additional_args=True)])
+    tasks.append(t2)
+    process = Process(tasks)
+
+    process.run(parallel=True)
+    assert len(key_calls) == 1
+    process_result = process.run(parallel=True)
+    assert len(key_calls) == 2
+    assert process_result.passed_tasks_results["task_2"].result == 1
+
+    with open(log_file_path, "r") as f:
+        assert "Reused cached result of task_2." in f.read()
+
+    clean_tasks_logs(tasks, remove_logs=False)
+    os.remove(log_file_path)
@@ -0,0 +1,130 @@
+import email
+import logging
+import pickle
+import smtplib
+import sys
+import time
+from unittest import mock
+
+from processes import HTMLSMTPHandler
+
+
+def error_record(name: str = "task_1", **extra) -> logging.LogRecord:
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        record = logging.LogRecord(name, logging.ERROR, __file__, 0, "failed", None, sys.exc_info())
+    record.__dict__.update(extra)
+    return record
+
+
+def sent_subjects(smtp_class: mock.MagicMock) -> list[str]:
+    smtp = smtp_class.return_value
+    return [email.message_from_string(call.args[2])["Subject"] for call in smtp.sendmail.call_args_list]
+
+
+def new_handler(**kwargs) -> HTMLSMTPHandler:
+    return HTMLSMTPHandler(("localhost", 25), "sender@example.com", ["receiver@example.com"], **kwargs)
+
+
+def test_reuse_connection():
+    handler = new_handler()
+    with mock.patch("smtplib.SMTP") as smtp_class:
+        smtp_class.return_value.noop.return_value = (250, b"OK")
+        handler.handle(error_record())
+        handler.handle(error_record())
+
+    assert smtp_class.call_count == 1
+    assert sent_subjects(smtp_class) == ["Error in task task_1", "Error in task task_1"]
+    handler.close()
+
+
+def test_mail_subject():
+    handler = new_handler()
+    with mock.patch("smtplib.SMTP") as smtp_class:
+        handler.handle(error_record(mail_subject="Custom subject"))
+
+    assert sent_subjects(smtp_class) == ["Custom subject"]
+    handler.close()
+
+
+def test_retry_disconnected():
+    handler = new_handler()
+    with mock.patch("smtplib.SMTP") as smtp_class:
+        smtp_class.return_value.sendmail.side_effect = [smtplib.SMTPServerDisconnected(), {}]
+        handler.handle(error_record())
+
+    assert smtp_class.call_count == 2
+    assert len(sent_subjects(smtp_class)) == 2
+    assert handler._smtp_sent == 1
+    handler.close()
+
+
+def test_idle_timeout():
+    handler = new_handler(idle_timeout=0.1)
+    with mock.patch("smtplib.SMTP") as smtp_class:
+        smtp_class.return_value.noop.return_value = (250, b"OK")
+        handler.handle(error_record())
+        time.sleep(0.2)
+        handler.handle(error_record())
+
+    assert smtp_class.call_count == 2
+    smtp_class.return_value.noop.assert_not_called()
+    handler.close()
+
+
+def test_dedup_window():
+    handler = new_handler(dedup_window=0.2)
+    with mock.patch("smtplib.SMTP") as smtp_class:
+        smtp_class.return_value.noop.return_value = (250, b"OK")
+        for _ in range(3):
+            handler.handle(error_record())
+        handler.handle(error_record("task_2"))
+        time.sleep(0.3)
+        handler.handle(error_record())
+
+    assert sent_subjects(smtp_class) == ["Error in task task_1", "Error in task task_2",
+                                         "Error in task task_1 (repeated 2 times since the last email)"]
+    # task_2's error was not repeated within the window, so it is forgotten.
+    assert list(handler._last_emailed) == [("task_1", "ZeroDivisionError: division by zero")]
+    handler.close()
+
+
+def test_dedup_window_failed_send():
+    handler = new_handler(dedup_window=60)
+    with mock.patch("smtplib.SMTP") as smtp_class, mock.patch.object(logging, "raiseExceptions", False):
+        smtp_class.side_effect = [ConnectionRefusedError(), mock.DEFAULT]
+        handler.handle(error_record())
+        handler.handle(error_record())
+
+    assert sent_subjects(smtp_class) == ["Error in task task_1"]
+    handler.close()
+
+
+def test_pickle_handler():
+    handler = new_handler(max_messages_per_connection=10, dedup_window=30, idle_timeout=60)
+    handler_copy = pickle.loads(pickle.dumps(handler))
+
+    assert (handler_copy.mailhost, handler_copy.mailport) == ("localhost", 25)
+    assert handler_copy.fromaddr == "sender@example.com"
+    assert handler_copy.toaddrs == ["receiver@example.com"]
+    assert handler_copy.max_messages_per_connection == 10
+    assert handler_copy.dedup_window == 30
+    assert handler_copy.idle_timeout == 60
+    handler.close()
+    handler_copy.close()
+
+
+def test_dedup_window_keeps_held_back_count():
+    handler = new_handler(dedup_window=0.2)
+    with mock.patch("smtplib.SMTP") as smtp_class:
+        smtp_class.return_value.noop.return_value = (250, b"OK")
+        for _ in range(3):
+            handler.handle(error_record())
+        time.sleep(0.3)
+        handler.handle(error_record("task_2"))
+        handler.handle(error_record())
+
+    assert sent_subjects(smtp_class) == ["Error in task task_1", "Error in task task_2",
+                                         "Error in task task_1 (repeated 2 times since the last email)"]
+    handler.close()
@@ -0,0 +1,33 @@
+import os
+from typing import Iterable
+
+from processes import Task
+
+
+_CURDIR = os.path.dirname(__file__)
+
+
+def clean_tasks_logs(tasks: list[Task] = (), remove_logs: bool = True):
+    # Tasks logging to the same file share one handler, so each handler is closed only once.
+    closed = set()
+    for task in tasks:
+        task_logger = task.logger
+        for handler in task_logger.handlers:
+            if id(handler) not in closed:
+                closed.add(id(handler))
+                handler.close()
+        task_logger.handlers.clear()
+    if not remove_logs:
+        return
+    with os.scandir(_CURDIR) as entries:
+        for entry in entries:
+            if entry.name.endswith(".log"):
+                os.remove(entry.path)
+
+
+def bulk_unlink(paths: Iterable[str]):
+    for path in paths:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
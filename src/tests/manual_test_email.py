@@ -1,3 +1,4 @@
+from functools import lru_cache
 import logging
 import json
 import logging.handlers
@@ -5,35 +6,51 @@ import os
 
 from processes import Process, Task, HTMLSMTPHandler
 
+from .log_cleaner import bulk_unlink
+
+_CURDIR = os.path.dirname(__file__)
+_LOG_FILE_PATH = os.path.join(_CURDIR, "logfile_1.log")
+
+
+@lru_cache(maxsize=None)
+def _load_smtp_config(path: str, mtime: float) -> dict:
+    # The modification time is part of the cache key, so an edited config file is read again.
+    with open(path, "r") as f:
+        return json.load(f)
 
 
 def send_mail_test():
     def div_zero_mail(a: int, b: int=0) -> int:
         return 1 / 0
     
-    curdir = os.path.dirname(__file__)
+    curdir = _CURDIR
     tasks = []
-    log_file_path = os.path.join(curdir, "logfile_1.log")
+    log_file_path = _LOG_FILE_PATH
 
-    smtp_config_file = ""
+    # SMTP_CONFIG_PATH lets the test run without a prompt, e.g. when it is run repeatedly.
+    smtp_config_file = os.environ.get("SMTP_CONFIG_PATH", "")
+    if smtp_config_file != "":
+        try:
+            smtp_config_mtime = os.path.getmtime(smtp_config_file)
+        except OSError:
+            print(f"File {smtp_config_file} from SMTP_CONFIG_PATH not found.")
+            smtp_config_file = ""
     while smtp_config_file == "":
         smtp_config_file = input("Enter path to smtp config json file path (relative to current directory) (Press ENTER to skip test): ")
         if len(smtp_config_file) == 0:
             print("Skipping send mail test.")
             return
-        if len(smtp_config_file) < 5:
+        if not smtp_config_file.endswith(".json"):
             smtp_config_file += ".json"
-        else:
-            if not smtp_config_file.endswith(".json"):
-                smtp_config_file += ".json"
         smtp_config_file = os.path.join(curdir, smtp_config_file)
-        if not os.path.exists(smtp_config_file):
+        # Stat once, the modification time found here is also the config cache key.
+        try:
+            smtp_config_mtime = os.path.getmtime(smtp_config_file)
+        except OSError:
             print(f"File {smtp_config_file} not found. Please try again.")
-            smtp_config_file = ""        
+            smtp_config_file = ""
 
-    with open(smtp_config_file, "r") as f:
-        smtp_config = f.read()
-        smtp_config_dict = json.loads(smtp_config)
+    smtp_config_dict = _load_smtp_config(smtp_config_file, smtp_config_mtime)
 
     smtp_server = smtp_config_dict["smtp_server"]
     smtp_port = smtp_config_dict["smtp_port"]
@@ -53,12 +70,10 @@ def send_mail_test():
     tasks.append(t1)
 
     process = Process(tasks)
-    process.run()
-
+    process.run(parallel=True)
 
-    for handler in t1.logger.handlers[:]:
-        handler.close()
-        t1.logger.removeHandler(handler)
-    os.remove(log_file_path)
+    process.close_loggers()
+    # Tasks may share a log file, each one is removed once.
+    bulk_unlink({task.log_path for task in tasks})
 
     print(f"Please, check that an email was sent to {recipients}.")
\ No newline at end of file